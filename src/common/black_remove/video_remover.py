@@ -4,6 +4,7 @@ import cv2
 import loguru
 import numpy as np
 
+from src.common.utils.image_utils import ImageUtils
 from src.signal_bus import SignalBus
 
 signal_bus = SignalBus()
@@ -38,17 +39,8 @@ class VideoRemover:
 
             binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
 
-            # 找出图像中的连通区域
-            num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
-
-            # 创建一个新的二值图像，用于保存去除孤立区域后的结果
-            new_binary = np.zeros_like(binary)
-
-            # 遍历所有连通区域
-            for i in range(1, num_labels):
-                # 如果该连通区域的大小大于阈值，则保留该区域
-                if stats[i, cv2.CC_STAT_AREA] > 1500:  # 500是阈值，可以根据实际情况调整
-                    new_binary[labels == i] = 255
+            # 去除孤立的小面积连通区域
+            new_binary = ImageUtils.remove_small_regions(binary, 1500)  # 1500是阈值，可以根据实际情况调整
 
             # 找到轮廓
             contours, _ = cv2.findContours(new_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -90,14 +90,14 @@ class IMGBlackRemover(BlackRemoveAlgorithm):
         right_bottom_x: int = img_width
         right_bottom_y: int = img_height
 
+        # 转换为灰度图像(只转换一次,后续判断与检测都使用灰度图像)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
         # 如果图像有黑边，则直接返回
-        if not self._image_utils.has_black_border(frame):
+        if not self._image_utils.has_black_border(gray):
             # loguru.logger.debug(f'{img_path} dont have black border, skip it')
             return left_top_x, left_top_y, right_bottom_x, right_bottom_y
 
-        # 转换为灰度图像
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
         # 计算平均亮度阈值
         # mean_threshold = np.mean(gray)
 
@@ -109,18 +109,6 @@ class IMGBlackRemover(BlackRemoveAlgorithm):
 
         binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
 
-        # 找出图像中的连通区域
-        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
-
-        # 创建一个新的二值图像，用于保存去除孤立区域后的结果
-        new_binary = np.zeros_like(binary)
-
-        # 遍历所有连通区域
-        for i in range(1, num_labels):
-            # 如果该连通区域的大小大于阈值，则保留该区域
-            if stats[i, cv2.CC_STAT_AREA] > 1500:  # 500是阈值，可以根据实际情况调整
-                new_binary[labels == i] = 255
-
         # 找出图像中的轮廓
         contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
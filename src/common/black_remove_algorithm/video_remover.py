@@ -1,17 +1,29 @@
 from pathlib import Path
+from typing import Iterable, Iterator
 
 import cv2
 import loguru
 import numpy as np
 
 from src.common.black_remove_algorithm.black_remove_algorithm import BlackRemoveAlgorithm
+from src.common.utils.image_utils import ImageUtils
 from src.signal_bus import SignalBus
 
 signal_bus = SignalBus()
 
 
 class VideoRemover(BlackRemoveAlgorithm):
-    def remove_black(self, input_file_path: str | Path) -> tuple[int, int, int, int]:
+    def remove_black(self, input_file_path: str | Path, sample_every: int = 1) -> tuple[int, int, int, int]:
+        """
+        检测视频中的最大变化区域
+
+        Args:
+            input_file_path: 视频路径
+            sample_every: 每隔多少帧取一帧参与差值计算,黑边位置在视频中通常不变,稀疏采样即可
+
+        Returns:
+            tuple[int, int, int, int]: 最大变化区域的x, y, w, h
+        """
         video_path: Path = Path(input_file_path)
         loguru.logger.info(f'正在使用差值法检测视频变化区域: {video_path.name}')
 
@@ -26,38 +38,48 @@ class VideoRemover(BlackRemoveAlgorithm):
         # 打开视频文件
         cap = cv2.VideoCapture(str(video_path))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        max_rect = self.detect_frames(self._read_frames(cap, sample_every), total_frames // max(1, sample_every))
+        cap.release()
+        loguru.logger.debug(f'检测视频变化区域完成: {video_path.name}')
+
+        return max_rect
+
+    def detect_frames(self, frames: Iterable[np.ndarray], total_frames: int = 0) -> tuple[int, int, int, int]:
+        """
+        根据相邻帧的差值计算最大变化区域
+
+        Args:
+            frames: 按顺序排列的视频帧,可以是BGR帧也可以是灰度帧
+            total_frames: 总帧数,仅用于进度条
+
+        Returns:
+            tuple[int, int, int, int]: 最大变化区域的x, y, w, h
+        """
         signal_bus.set_detail_progress_max.emit(total_frames)
-        ret, frame1 = cap.read()
-        ret, frame2 = cap.read()
+        frames = iter(frames)
+        frame1 = next(frames, None)
+        if frame1 is None:
+            signal_bus.set_detail_progress_finish.emit()
+            return 0, 0, 0, 0
 
         # 初始化累计变化图像
         height, width = frame1.shape[:2]
         accumulated_changes = np.zeros((height, width), dtype=np.uint8)
+        kernel = np.ones((5, 5), np.uint8)
 
-        for frame_index in range(total_frames - 2):
+        for frame_index, frame2 in enumerate(frames):
             # 计算帧差异
             diff = cv2.absdiff(frame1, frame2)
-            gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+            gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY) if diff.ndim == 3 else diff
             blur = cv2.GaussianBlur(gray, (5, 5), 0)
             _, thresh = cv2.threshold(blur, 20, 255, cv2.THRESH_BINARY)
 
-            kernel = np.ones((5, 5), np.uint8)
-
             binary = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
 
             binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
 
-            # 找出图像中的连通区域
-            num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
-
-            # 创建一个新的二值图像，用于保存去除孤立区域后的结果
-            new_binary = np.zeros_like(binary)
-
-            # 遍历所有连通区域
-            for i in range(1, num_labels):
-                # 如果该连通区域的大小大于阈值，则保留该区域
-                if stats[i, cv2.CC_STAT_AREA] > 1500:  # 500是阈值，可以根据实际情况调整
-                    new_binary[labels == i] = 255
+            # 去除孤立的小面积连通区域
+            new_binary = ImageUtils.remove_small_regions(binary, 1500)  # 1500是阈值，可以根据实际情况调整
 
             # 找到轮廓
             contours, _ = cv2.findContours(new_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -66,16 +88,11 @@ class VideoRemover(BlackRemoveAlgorithm):
                 if cv2.contourArea(contour) < 500:
                     continue
                 x, y, w, h = cv2.boundingRect(contour)
-                cv2.rectangle(frame1, (x, y), (x + w, y + h), (255, 255, 255), -1)
                 cv2.rectangle(accumulated_changes, (x, y), (x + w, y + h), 255, -1)
 
             frame1 = frame2
-            ret, frame2 = cap.read()
             signal_bus.set_detail_progress_current.emit(frame_index)
 
-        cap.release()
-        loguru.logger.debug(f'检测视频变化区域完成: {video_path.name}')
-
         # 找到累计变化图像中的轮廓以确定最大变化区域
         contours, _ = cv2.findContours(accumulated_changes, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
@@ -95,6 +112,29 @@ class VideoRemover(BlackRemoveAlgorithm):
 
         return max_rect
 
+    @staticmethod
+    def _read_frames(cap: cv2.VideoCapture, sample_every: int = 1) -> Iterator[np.ndarray]:
+        """
+        每隔sample_every帧读取一帧并转换为灰度帧,读取失败时结束
+        差值检测不需要颜色信息,读取后立即转为灰度可以减少后续处理的数据量;
+        交替复用两块灰度缓冲区,调用方最多可同时持有相邻两帧
+        """
+        frame: np.ndarray | None = None
+        gray_buffers: list[np.ndarray | None] = [None, None]
+        index = 0
+        while True:
+            ret, frame = cap.read(frame)
+            if not ret:
+                return
+            gray_buffers[index] = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray_buffers[index])
+            yield gray_buffers[index]
+            index ^= 1
+
+            # 跳过的帧只解封装不做颜色转换
+            for _ in range(sample_every - 1):
+                if not cap.grab():
+                    return
+
 
 if __name__ == '__main__':
     # 使用示例
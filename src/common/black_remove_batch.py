@@ -0,0 +1,535 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
+import cv2
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from typing import Iterator
+
+from src.common.black_remove_algorithm.black_remove_algorithm import BlackRemoveAlgorithm
+from src.common.black_remove_algorithm.video_remover import VideoRemover
+from src.common.black_remove_algorithm.img_black_remover import IMGBlackRemover
+from src.common.black_remove.img_black_remover import BlackRemover
+
+try:
+    import orjson
+
+    load_json = orjson.loads
+
+    def dump_json(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+except ImportError:  # orjson为可选依赖，未安装时使用标准库
+    load_json = json.loads
+
+    def dump_json(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+
+# 支持的媒体类型扩展名
+VIDEO_EXTS = frozenset(('.mp4', '.avi', '.flv', '.mov', '.mkv'))
+IMAGE_EXTS = frozenset(('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff'))
+
+# 每次FFmpeg调用合并的裁剪任务数
+CROP_BATCH_SIZE = 8
+
+# 裁剪任务: (输入路径, 输出路径, (x, y, w, h))
+CropJob = tuple[str, str, tuple[int, int, int, int]]
+
+
+@dataclass(frozen=True, slots=True)
+class H264Encoder:
+    name: str
+    input_args: tuple[str, ...]  # 放在-i之前的参数(如硬件设备)
+    filter_suffix: str  # 追加在crop滤镜之后的滤镜(如上传到显存)
+    codec_args: tuple[str, ...]
+
+
+# 重新编码裁剪时可用的编码器，按优先级排列，质量参数与libx264的CRF 23大致相当
+# （NVENC需要-b:v 0取消默认的2M平均码率，-cq才是真正的恒定质量）
+H264_ENCODERS: tuple[H264Encoder, ...] = (
+    H264Encoder('h264_nvenc', (), '',
+                ('-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-b:v', '0')),
+    H264Encoder('h264_vaapi', ('-vaapi_device', '/dev/dri/renderD128'), ',format=nv12,hwupload',
+                ('-c:v', 'h264_vaapi', '-qp', '23')),
+    H264Encoder('h264_videotoolbox', (), '',
+                ('-c:v', 'h264_videotoolbox', '-q:v', '65')),
+)
+# libx264的preset由调用方传入，见 _codec_args
+LIBX264_ENCODER = H264Encoder('libx264', (), '',
+                              ('-c:v', 'libx264', '-crf', '23', '-tune', 'fastdecode', '-threads', '0'))
+
+
+def check_environment():
+    """检查并返回当前运行环境信息"""
+    return {
+        "python_path": sys.executable,
+        "conda_env": os.environ.get('CONDA_DEFAULT_ENV', 'None')
+    }
+
+
+def _probe_stream(path: str) -> dict:
+    """使用ffprobe读取首个视频流的元数据，只解析容器而不初始化解码器"""
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,width,height,coded_width,coded_height,nb_frames'
+                         ':stream_tags=rotate:stream_side_data=rotation',
+        '-of', 'json',
+        path
+    ]
+    out = subprocess.check_output(command)
+    return load_json(out)['streams'][0]
+
+
+def _stream_rotation(stream: dict) -> int:
+    """获取视频流的旋转角度"""
+    rotation = int(stream.get('tags', {}).get('rotate', 0))
+    for side_data in stream.get('side_data_list', []):
+        rotation = int(side_data.get('rotation', rotation))
+    return rotation
+
+
+def _video_wh(path: str) -> tuple[int, int]:
+    """使用OpenCV读取视频宽高，只打开一次视频并及时释放"""
+    cap = cv2.VideoCapture(path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+
+
+def _probe_video(path: str) -> tuple[tuple[int, int], dict | None]:
+    """
+    读取视频显示宽高（ffmpeg默认会自动旋转画面，竖屏拍摄的视频需要交换宽高）以及ffprobe得到的视频流信息，
+    ffprobe不可用时退回OpenCV读取宽高，视频流信息为None
+    """
+    try:
+        stream = _probe_stream(path)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return _video_wh(path), None
+    width, height = int(stream['width']), int(stream['height'])
+    if abs(_stream_rotation(stream)) % 180 == 90:
+        return (height, width), stream
+    return (width, height), stream
+
+
+def _image_wh(path: str | Path) -> tuple[int, int]:
+    """只解析图片文件头获取宽高，不解码像素（与cv2.imread一致，按EXIF方向换算）"""
+    with Image.open(path) as img:
+        width, height = img.size
+        # EXIF方向为5~8时图片需要旋转90度显示
+        if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            return height, width
+    return width, height
+
+
+def _iter_frames_piped(path: str, width: int, height: int, sample_every: int = 1) -> Iterator[np.ndarray]:
+    """
+    通过ffmpeg管道每隔sample_every帧输出一帧灰度帧，供黑边检测使用
+    帧数据直接读入两块预先分配的缓冲区并交替复用，每帧只在下一帧之后被覆盖，调用方最多可同时持有相邻两帧
+    """
+    command = [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', path,
+        '-f', 'rawvideo',
+        '-pix_fmt', 'gray',
+        '-'
+    ]
+    if sample_every > 1:
+        # 在ffmpeg内丢弃未采样的帧，-vsync 0 防止为补齐帧率而重复输出帧
+        command[-1:-1] = ['-vf', f'select=not(mod(n\\,{sample_every}))', '-vsync', '0']
+    frame_size = width * height
+    buffers = (np.empty((height, width), np.uint8), np.empty((height, width), np.uint8))
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=1 << 20)
+    try:
+        index = 0
+        while True:
+            frame = buffers[index]
+            if process.stdout.readinto(frame.data) < frame_size:
+                break
+            yield frame
+            index ^= 1
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+def _sample_interval(stream: dict | None, sample_rate: int) -> int:
+    """根据视频总帧数限制采样间隔，保证短视频也至少能采到约20帧（容器未记录帧数时按sample_rate采样）"""
+    nb_frames = int(stream.get('nb_frames') or 0) if stream else 0
+    if nb_frames <= 0:
+        return max(1, sample_rate)
+    return max(1, min(sample_rate, nb_frames // 20))
+
+
+def _detect_frames_sampled(remover: VideoRemover, path: str, width: int, height: int,
+                           sample_every: int) -> tuple[int, int, int, int]:
+    """动态算法隔帧检测黑边，采样不足两帧（无法比较帧间变化）时退回逐帧检测"""
+    sampled = 0
+
+    def counted(frames: Iterator[np.ndarray]) -> Iterator[np.ndarray]:
+        nonlocal sampled
+        for frame in frames:
+            sampled += 1
+            yield frame
+
+    rect = remover.detect_frames(counted(_iter_frames_piped(path, width, height, sample_every)))
+    if sampled < 2 and sample_every > 1:
+        rect = remover.detect_frames(_iter_frames_piped(path, width, height))
+    return rect
+
+
+def _metadata_crop_args(stream: dict | None, rect: tuple[int, int, int, int]) -> list[str] | None:
+    """
+    裁剪边界全部对齐16像素宏块且视频为未旋转的H.264时，返回通过码流元数据裁剪的参数，否则返回None
+    此时只需改写SPS中的裁剪信息并直接复制码流，无需重新编码
+    :param stream: _probe_video 得到的视频流信息，为None时总是需要重新编码
+    """
+    if stream is None or stream.get('codec_name') != 'h264' or _stream_rotation(stream) != 0:
+        return None
+    x, y, w, h = rect
+    original_w, original_h = int(stream['width']), int(stream['height'])
+    if any(value % 16 for value in (x, y, original_w - x - w, original_h - y - h)):
+        return None
+
+    # h264_metadata的裁剪量相对宏块对齐后的编码尺寸计算，并会覆盖SPS中原有的裁剪
+    # （如1080p编码为1088行、底部裁掉8行），因此右侧和底部要按编码尺寸补上这部分
+    coded_w = max(int(stream.get('coded_width') or 0), -(-original_w // 16) * 16)
+    coded_h = max(int(stream.get('coded_height') or 0), -(-original_h // 16) * 16)
+    crop_right = coded_w - x - w
+    crop_bottom = coded_h - y - h
+    return [
+        '-c', 'copy',
+        '-bsf:v', f'h264_metadata=crop_left={x}:crop_right={crop_right}:crop_top={y}:crop_bottom={crop_bottom}'
+    ]
+
+
+@lru_cache(maxsize=None)
+def _detect_encoder() -> H264Encoder:
+    """检测可用的硬件H.264编码器，只有编译进FFmpeg且能实际完成一次编码的才会使用，否则使用libx264"""
+    try:
+        encoders = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    except FileNotFoundError:
+        return LIBX264_ENCODER
+
+    for encoder in H264_ENCODERS:
+        if encoder.name not in encoders:
+            continue
+        # 编码器存在不代表有可用的显卡，用一帧测试画面验证
+        command = [
+            'ffmpeg', '-hide_banner', '-v', 'error',
+            *encoder.input_args,
+            '-f', 'lavfi', '-i', 'color=black:size=256x256',
+            '-frames:v', '1',
+            '-vf', f'crop=256:256:0:0{encoder.filter_suffix}',
+            *encoder.codec_args,
+            '-f', 'null', '-'
+        ]
+        if subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+            return encoder
+    return LIBX264_ENCODER
+
+
+def _codec_args(encoder: H264Encoder, preset: str) -> list[str]:
+    """获取编码参数，preset只作用于libx264（硬件编码器的preset取值不同）"""
+    if encoder is LIBX264_ENCODER:
+        return [*encoder.codec_args, '-preset', preset]
+    return list(encoder.codec_args)
+
+
+def _stream_maps(index: int) -> list[str]:
+    """第index个输入中随画面一起输出的流：首个音频流和首个字幕流（如果有），单个裁剪与合并裁剪保持一致"""
+    return ['-map', f'{index}:a:0?', '-map', f'{index}:s:0?']
+
+
+def _run_ffmpeg(command: list[str], input_path: str, output_path: str) -> str:
+    """执行FFmpeg命令并返回处理结果描述"""
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return f"视频裁剪完成: {input_path} -> {output_path}"
+    except subprocess.CalledProcessError as e:
+        return f"视频裁剪失败 {input_path}: {e.stderr}"
+    except FileNotFoundError:
+        return "未找到ffmpeg，请确保已安装并添加到环境变量"
+
+
+def crop_video(input_path: str, output_path: str, rect: tuple[int, int, int, int],
+               stream: dict | None = None, preset: str = 'ultrafast') -> str:
+    """使用FFmpeg裁剪视频，传入ffprobe得到的视频流信息时优先尝试不重新编码的码流裁剪，preset为libx264的编码速度"""
+    x, y, w, h = rect
+    if w <= 0 or h <= 0:
+        raise ValueError(f"无效的裁剪参数: {rect}")
+
+    input_args = []
+    codec_args = _metadata_crop_args(stream, rect)
+    if codec_args is None:
+        encoder = _detect_encoder()
+        input_args = list(encoder.input_args)
+        codec_args = [
+            '-vf', f'crop={w}:{h}:{x}:{y}{encoder.filter_suffix}',
+            *_codec_args(encoder, preset),
+            '-c:a', 'copy',
+            '-c:s', 'copy',
+        ]
+
+    command = [
+        'ffmpeg',
+        *input_args,
+        '-i', input_path,
+        '-map', '0:v:0', *_stream_maps(0),
+        *codec_args,
+        '-y',
+        output_path
+    ]
+    return _run_ffmpeg(command, input_path, output_path)
+
+
+def _probe_duration(path: str) -> float:
+    """使用ffprobe读取媒体文件时长（秒）"""
+    command = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', path]
+    return float(load_json(subprocess.check_output(command))['format']['duration'])
+
+
+def _crop_output_complete(input_path: str, output_path: str) -> bool:
+    """判断裁剪输出是否完整写出（可以解析且时长与原视频相差不超过0.5秒）"""
+    if not os.path.exists(output_path):
+        return False
+    try:
+        return _probe_duration(output_path) >= _probe_duration(input_path) - 0.5
+    except (FileNotFoundError, subprocess.CalledProcessError, KeyError, ValueError):
+        return False
+
+
+def _run_crop_batch(jobs: list[CropJob], preset: str = 'ultrafast') -> list[str]:
+    """
+    将多个需要重新编码的裁剪任务合并为一次FFmpeg调用（每个输入对应一个crop滤镜和一个输出），
+    省去逐个启动进程和初始化编码器的开销；合并调用失败时只逐个重新裁剪缺失或不完整的输出，避免一个文件拖累整组
+    """
+    if len(jobs) == 1:
+        return [crop_video(*jobs[0], preset=preset)]
+
+    encoder = _detect_encoder()
+    codec_args = _codec_args(encoder, preset)
+    command = ['ffmpeg', '-y', *encoder.input_args]
+    for input_path, _, _ in jobs:
+        command += ['-i', input_path]
+    command += ['-filter_complex', ';'.join(
+            f'[{index}:v]crop={w}:{h}:{x}:{y}{encoder.filter_suffix}[v{index}]'
+            for index, (_, _, (x, y, w, h)) in enumerate(jobs)
+    )]
+    for index, (_, output_path, _) in enumerate(jobs):
+        command += ['-map', f'[v{index}]', *_stream_maps(index),
+                    *codec_args, '-c:a', 'copy', '-c:s', 'copy', output_path]
+
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return [f"视频裁剪完成: {input_path} -> {output_path}" for input_path, output_path, _ in jobs]
+    except subprocess.CalledProcessError:
+        return [f"视频裁剪完成: {input_path} -> {output_path}" if _crop_output_complete(input_path, output_path)
+                else crop_video(input_path, output_path, rect, preset=preset)
+                for input_path, output_path, rect in jobs]
+    except FileNotFoundError:
+        return ["未找到ffmpeg，请确保已安装并添加到环境变量"]
+
+
+def crop_image(input_path: str, output_path: str, rect: tuple[int, int, int, int]) -> str:
+    """使用OpenCV裁剪图片"""
+    x1, y1, x2, y2 = rect  # 图片处理返回的是左上角和右下角坐标
+    w = x2 - x1
+    h = y2 - y1
+    if w <= 0 or h <= 0:
+        raise ValueError(f"无效的裁剪参数: {rect}")
+    
+    img = cv2.imread(input_path)
+    if img is None:
+        raise FileNotFoundError(f"无法读取图片: {input_path}")
+    
+    cropped_img = img[y1:y2, x1:x2]
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    cv2.imwrite(output_path, cropped_img)
+    return f"图片裁剪完成: {input_path} -> {output_path}"
+
+
+@lru_cache(maxsize=None)
+def get_remover(media_type: str, algorithm: str = "dynamic") -> BlackRemoveAlgorithm | BlackRemover:
+    """根据媒体类型和算法选择对应的黑边处理器（处理器不保存单次检测的状态，每个进程内复用同一实例）"""
+    if media_type == "video":
+        if algorithm == "dynamic":
+            return VideoRemover()
+        elif algorithm == "static":
+            return IMGBlackRemover()
+        else:
+            raise ValueError(f"不支持的视频算法: {algorithm}")
+    elif media_type == "image":
+        return BlackRemover()  # 图片固定使用静态算法
+    else:
+        raise ValueError(f"不支持的媒体类型: {media_type}")
+
+
+def _copy_file(src: Path, dst: Path, hardlink: bool = False) -> None:
+    """复制文件，启用hardlink时优先创建硬链接（同一文件系统下无需复制数据），失败时退回复制"""
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass  # 跨设备或文件系统不支持硬链接
+    shutil.copy2(src, dst)
+
+
+def _walk_files(root: str | Path) -> Iterator[os.DirEntry]:
+    """递归遍历目录下的所有文件，直接使用目录列表中缓存的文件类型，避免逐个stat"""
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _walk_files(entry.path)
+                elif entry.is_file():
+                    yield entry
+    except PermissionError:
+        return
+
+
+def _existing_files(root: Path) -> set[Path]:
+    """一次遍历输出目录，返回其中已存在文件的相对路径集合，代替逐个文件调用exists()"""
+    return {Path(dirpath, filename).relative_to(root)
+            for dirpath, _, filenames in os.walk(root) for filename in filenames}
+
+
+def _process_one(input_path: Path, output_file: Path, media_type: str, crop_enabled: bool,
+                 video_algorithm: str, max_frames: int, sample_rate: int,
+                 hardlink: bool) -> tuple[str, CropJob | None]:
+    """
+    处理单个文件（在进程池的工作进程中执行）
+    返回处理结果描述，以及需要重新编码裁剪的视频任务（交给 _run_crop_batch 合并执行，其余情况为None）
+    """
+    try:
+        # 获取黑边处理器
+        remover = get_remover(media_type, video_algorithm)
+
+        # 检测黑边区域
+        if media_type == "video":
+            (original_w, original_h), stream = _probe_video(str(input_path))
+            if video_algorithm == "static":
+                rect = remover.remove_black(str(input_path), max_frames=max_frames)
+            else:
+                # 动态算法需要逐帧解码，直接从ffmpeg管道读取灰度帧
+                rect = _detect_frames_sampled(remover, str(input_path), original_w, original_h,
+                                              _sample_interval(stream, sample_rate))
+            # 视频处理器返回 (x, y, w, h)
+            x, y, w, h = rect
+            has_black = not (w == original_w and h == original_h)
+        else:  # 图片
+            # 图片处理器返回 (x1, y1, x2, y2)
+            rect = remover.start(img_path=str(input_path))
+            x1, y1, x2, y2 = rect
+            original_w, original_h = _image_wh(input_path)
+            has_black = not (x1 == 0 and y1 == 0 and x2 == original_w and y2 == original_h)
+
+        # 根据配置决定是否裁剪
+        if not crop_enabled or not has_black:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            _copy_file(input_path, output_file, hardlink)
+            return f"无需裁剪，复制完成: {input_path} -> {output_file}", None
+        if media_type == "image":
+            return crop_image(str(input_path), str(output_file), rect), None
+
+        if w <= 0 or h <= 0:
+            raise ValueError(f"无效的裁剪参数: {rect}")
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        if _metadata_crop_args(stream, rect) is None:
+            return f"检测完成，等待裁剪: {input_path}", (str(input_path), str(output_file), rect)
+        return crop_video(str(input_path), str(output_file), rect, stream), None
+
+    except Exception as e:
+        return f"处理文件 {input_path} 失败: {str(e)}", None
+
+
+def batch_process_media(input_dir: str, output_dir: str, crop_enabled: bool = True,
+                       video_algorithm: str = "dynamic", max_frames: int = 500, sample_rate: int = 30,
+                       preset: str = "ultrafast", hardlink: bool = False,
+                       media_types: tuple[str, ...] = ("video", "image")) -> str:
+    """
+    批量处理目录下所有图片和视频，保持目录结构
+    :param input_dir: 输入目录
+    :param output_dir: 输出目录
+    :param crop_enabled: 是否启用裁剪
+    :param video_algorithm: 视频处理算法（dynamic/static）
+    :param max_frames: 视频静态算法最大采样帧数
+    :param sample_rate: 视频动态算法每隔多少帧采样一帧（短视频会自动缩小间隔）
+    :param preset: 视频使用libx264重新编码时的preset
+    :param hardlink: 无需裁剪时是否用硬链接代替复制（输出与原文件共享数据）
+    :param media_types: 需要处理的媒体类型，其余文件跳过
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    existing_files = _existing_files(output_dir)
+
+    # 各文件互不依赖，交给进程池并行处理，留一半核心给ffmpeg子进程
+    max_workers = max(1, (os.cpu_count() or 2) // 2)
+    # 每组裁剪本身就是同时运行多个编码器的FFmpeg进程，交给单独的单线程执行器逐组执行，
+    # 避免与检测进程池叠加后占满CPU和内存
+    with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+            ThreadPoolExecutor(max_workers=1) as crop_executor:
+        futures = []
+        for entry in _walk_files(input_dir):
+            # 先按文件名过滤，只为支持的媒体文件构建Path
+            suffix = os.path.splitext(entry.name)[1].lower()
+            media_type = 'video' if suffix in VIDEO_EXTS else 'image' if suffix in IMAGE_EXTS else None
+            if media_type is None:
+                print(f"跳过不支持的文件: {entry.path}")
+                continue
+            if media_type not in media_types:
+                continue  # 支持但本次未选择的媒体类型直接忽略
+
+            # 构建输出路径
+            input_path = Path(entry.path)
+            rel_path = input_path.relative_to(input_dir)
+            output_rel_path = rel_path.parent / f"{rel_path.stem}_noblack{rel_path.suffix}"
+
+            # 跳过已处理文件
+            if output_rel_path in existing_files:
+                print(f"已处理，跳过: {input_path}")
+                continue
+
+            futures.append(executor.submit(_process_one, input_path, output_dir / output_rel_path, media_type,
+                                           crop_enabled, video_algorithm, max_frames, sample_rate, hardlink))
+        crop_jobs: list[CropJob] = []
+        crop_futures = []
+        for future in as_completed(futures):
+            message, crop_job = future.result()
+            print(message)
+            if crop_job is None:
+                continue
+            # 需要重新编码的视频凑满一组后立即合并提交
+            crop_jobs.append(crop_job)
+            if len(crop_jobs) >= CROP_BATCH_SIZE:
+                crop_futures.append(crop_executor.submit(_run_crop_batch, crop_jobs, preset))
+                crop_jobs = []
+        if crop_jobs:
+            crop_futures.append(crop_executor.submit(_run_crop_batch, crop_jobs, preset))
+
+        for future in as_completed(crop_futures):
+            for message in future.result():
+                print(message)
+
+    return str(output_dir)
+
+
+def batch_crop_videos(input_dir: str, output_dir: str, hardlink: bool = False, sample_rate: int = 30,
+                      preset: str = "ultrafast") -> str:
+    """只处理视频的批量去黑边，与 batch_process_media 共用同一套流程"""
+    return batch_process_media(input_dir, output_dir, video_algorithm="dynamic", sample_rate=sample_rate,
+                               preset=preset, hardlink=hardlink, media_types=("video",))
@@ -46,13 +46,14 @@ class ImageUtils:
         判断图像是否有黑边
 
         Args:
-            img: 图像
+            img: BGR图像或灰度图像
 
         Returns:
             bool: 是否有黑边
         """
-        # 读取图像
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # 已经是灰度图像时无需再次转换
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         threshold = self.threshold
         border_width = self.border_width
 
@@ -69,3 +70,22 @@ class ImageUtils:
                 or np.mean(left_edge) < threshold
                 or np.mean(right_edge) < threshold
         )
+
+    @staticmethod
+    def remove_small_regions(binary: np.ndarray, min_area: int = 1500) -> np.ndarray:
+        """
+        去除二值图像中面积不大于阈值的连通区域
+
+        Args:
+            binary: 二值图像
+            min_area: 保留的连通区域需要超过的面积
+
+        Returns:
+            np.ndarray: 只保留大面积连通区域的二值图像
+        """
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+
+        # 按连通区域编号查表,一次生成结果,而不是对每个区域都扫描一遍整张图
+        lut = np.where(stats[:, cv2.CC_STAT_AREA] > min_area, 255, 0).astype(np.uint8)
+        lut[0] = 0  # 0号为背景
+        return lut[labels]
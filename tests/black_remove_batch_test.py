@@ -0,0 +1,365 @@
+import json
+import subprocess
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+from src.common import black_remove_batch
+from src.common.black_remove.img_black_remover import BlackRemover
+from src.common.black_remove_algorithm.video_remover import VideoRemover
+
+H264_1080P = {'codec_name': 'h264', 'width': 1920, 'height': 1080, 'coded_width': 1920, 'coded_height': 1088}
+
+
+def _ffprobe_output(**stream) -> bytes:
+    return json.dumps({'streams': [{'codec_name': 'h264', 'width': 1920, 'height': 1080, **stream}]}).encode()
+
+
+class TestJson(unittest.TestCase):
+
+    def test_round_trip_keeps_non_ascii(self):
+        data = {"success": True, "video_path": "输出/视频", "error": None}
+        text = black_remove_batch.dump_json(data)
+        self.assertIn("输出/视频", text)
+        self.assertEqual(black_remove_batch.load_json(text), data)
+        self.assertEqual(black_remove_batch.load_json(text.encode('utf-8')), data)
+
+
+class TestFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        Path(self.root, 'sub', 'deep').mkdir(parents=True)
+        for name in ('a.mp4', 'sub/b.png', 'sub/deep/c.txt'):
+            Path(self.root, name).touch()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_walk_files_recurses_and_yields_files_only(self):
+        paths = {Path(entry.path) for entry in black_remove_batch._walk_files(self.root)}
+        self.assertEqual(paths, {self.root / 'a.mp4', self.root / 'sub' / 'b.png',
+                                 self.root / 'sub' / 'deep' / 'c.txt'})
+
+    def test_walk_files_missing_root_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            list(black_remove_batch._walk_files(self.root / 'missing'))
+
+    def test_existing_files_relative_paths(self):
+        self.assertEqual(black_remove_batch._existing_files(self.root),
+                         {Path('a.mp4'), Path('sub', 'b.png'), Path('sub', 'deep', 'c.txt')})
+
+    def test_copy_file_falls_back_when_hardlink_fails(self):
+        with patch.object(black_remove_batch.os, 'link', side_effect=OSError):
+            black_remove_batch._copy_file(self.root / 'a.mp4', self.root / 'a_copy.mp4', hardlink=True)
+        self.assertTrue((self.root / 'a_copy.mp4').is_file())
+        self.assertFalse((self.root / 'a_copy.mp4').samefile(self.root / 'a.mp4'))
+
+
+class TestProbeVideo(unittest.TestCase):
+
+    @patch.object(black_remove_batch.subprocess, 'check_output', return_value=_ffprobe_output())
+    def test_reads_stream_size(self, mock_check_output):
+        size, stream = black_remove_batch._probe_video('a.mp4')
+        self.assertEqual(size, (1920, 1080))
+        self.assertEqual(stream['codec_name'], 'h264')
+        self.assertEqual(mock_check_output.call_args.args[0][0], 'ffprobe')
+
+    @patch.object(black_remove_batch.subprocess, 'check_output', return_value=_ffprobe_output(tags={'rotate': '90'}))
+    def test_rotate_tag_swaps_size(self, mock_check_output):
+        self.assertEqual(black_remove_batch._probe_video('a.mp4')[0], (1080, 1920))
+
+    @patch.object(black_remove_batch.subprocess, 'check_output',
+                  return_value=_ffprobe_output(side_data_list=[{'rotation': -90}]))
+    def test_rotation_side_data_swaps_size(self, mock_check_output):
+        self.assertEqual(black_remove_batch._probe_video('a.mp4')[0], (1080, 1920))
+
+    @patch.object(black_remove_batch.subprocess, 'check_output',
+                  return_value=_ffprobe_output(side_data_list=[{'rotation': 180}]))
+    def test_upside_down_keeps_size(self, mock_check_output):
+        self.assertEqual(black_remove_batch._probe_video('a.mp4')[0], (1920, 1080))
+
+    @patch.object(black_remove_batch, '_video_wh', return_value=(640, 480))
+    @patch.object(black_remove_batch.subprocess, 'check_output', side_effect=FileNotFoundError)
+    def test_missing_ffprobe_falls_back_to_opencv(self, mock_check_output, mock_video_wh):
+        self.assertEqual(black_remove_batch._probe_video('a.mp4'), ((640, 480), None))
+
+    @patch.object(black_remove_batch, '_video_wh', return_value=(640, 480))
+    @patch.object(black_remove_batch.subprocess, 'check_output',
+                  side_effect=subprocess.CalledProcessError(1, 'ffprobe'))
+    def test_ffprobe_error_falls_back_to_opencv(self, mock_check_output, mock_video_wh):
+        self.assertEqual(black_remove_batch._probe_video('a.mp4'), ((640, 480), None))
+
+
+class TestImageWH(unittest.TestCase):
+
+    def _save_jpeg(self, path: Path, orientation: int | None = None):
+        image = Image.new('RGB', (40, 30))
+        exif = image.getexif()
+        if orientation is not None:
+            exif[0x0112] = orientation
+        image.save(path, exif=exif)
+
+    def test_plain_image(self):
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp, 'a.jpg')
+            self._save_jpeg(path)
+            self.assertEqual(black_remove_batch._image_wh(path), (40, 30))
+
+    def test_exif_rotated_image_swaps_size(self):
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp, 'a.jpg')
+            self._save_jpeg(path, orientation=6)
+            self.assertEqual(black_remove_batch._image_wh(path), (30, 40))
+
+    def test_exif_flipped_image_keeps_size(self):
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp, 'a.jpg')
+            self._save_jpeg(path, orientation=3)
+            self.assertEqual(black_remove_batch._image_wh(path), (40, 30))
+
+
+class TestMetadataCropArgs(unittest.TestCase):
+
+    def test_crop_relative_to_coded_size(self):
+        # 1080p编码为1088行，底部已有8行裁剪，需要一并计入crop_bottom
+        args = black_remove_batch._metadata_crop_args(H264_1080P, (0, 128, 1920, 824))
+        self.assertEqual(args[-1], 'h264_metadata=crop_left=0:crop_right=0:crop_top=128:crop_bottom=136')
+
+    def test_coded_size_defaults_to_macroblock_alignment(self):
+        stream = {'codec_name': 'h264', 'width': 1920, 'height': 1080}
+        args = black_remove_batch._metadata_crop_args(stream, (16, 128, 1888, 824))
+        self.assertEqual(args[-1], 'h264_metadata=crop_left=16:crop_right=16:crop_top=128:crop_bottom=136')
+
+    def test_unaligned_crop_needs_reencode(self):
+        self.assertIsNone(black_remove_batch._metadata_crop_args(H264_1080P, (0, 120, 1920, 840)))
+
+    def test_non_h264_needs_reencode(self):
+        self.assertIsNone(black_remove_batch._metadata_crop_args({**H264_1080P, 'codec_name': 'hevc'},
+                                                                 (0, 128, 1920, 824)))
+
+    def test_rotated_stream_needs_reencode(self):
+        stream = {**H264_1080P, 'side_data_list': [{'rotation': 90}]}
+        self.assertIsNone(black_remove_batch._metadata_crop_args(stream, (0, 128, 1920, 824)))
+
+    def test_unknown_stream_needs_reencode(self):
+        self.assertIsNone(black_remove_batch._metadata_crop_args(None, (0, 128, 1920, 824)))
+
+
+class TestSampleInterval(unittest.TestCase):
+
+    def test_short_video_caps_interval(self):
+        self.assertEqual(black_remove_batch._sample_interval({'nb_frames': '30'}, 30), 1)
+        self.assertEqual(black_remove_batch._sample_interval({'nb_frames': '200'}, 30), 10)
+
+    def test_long_video_keeps_sample_rate(self):
+        self.assertEqual(black_remove_batch._sample_interval({'nb_frames': '90000'}, 30), 30)
+
+    def test_unknown_frame_count_keeps_sample_rate(self):
+        self.assertEqual(black_remove_batch._sample_interval({}, 30), 30)
+        self.assertEqual(black_remove_batch._sample_interval(None, 30), 30)
+
+    @patch.object(black_remove_batch, '_iter_frames_piped')
+    def test_falls_back_to_every_frame(self, mock_iter_frames):
+        frame = np.zeros((4, 4), np.uint8)
+        mock_iter_frames.side_effect = [iter([frame]), iter([frame, frame])]
+        with patch.object(VideoRemover, 'detect_frames', side_effect=lambda frames: len(list(frames))):
+            self.assertEqual(black_remove_batch._detect_frames_sampled(VideoRemover(), 'in.mp4', 4, 4, 30), 2)
+        self.assertEqual(mock_iter_frames.call_args_list[-1].args, ('in.mp4', 4, 4))
+
+
+@patch.object(black_remove_batch, '_detect_encoder', return_value=black_remove_batch.LIBX264_ENCODER)
+@patch.object(black_remove_batch.subprocess, 'run')
+class TestCropVideo(unittest.TestCase):
+
+    def test_invalid_rect_raises(self, mock_run, mock_detect_encoder):
+        with self.assertRaises(ValueError):
+            black_remove_batch.crop_video('a.mp4', 'a_out.mp4', (0, 0, 0, 360))
+        mock_run.assert_not_called()
+        mock_detect_encoder.assert_not_called()
+
+    def test_aligned_h264_crop_copies_stream(self, mock_run, mock_detect_encoder):
+        black_remove_batch.crop_video('a.mp4', 'a_out.mp4', (0, 128, 1920, 824), H264_1080P)
+        command = mock_run.call_args.args[0]
+        self.assertIn('copy', command)
+        self.assertNotIn('-vf', command)
+        mock_detect_encoder.assert_not_called()
+
+    def test_without_stream_reencodes(self, mock_run, mock_detect_encoder):
+        black_remove_batch.crop_video('a.mp4', 'a_out.mp4', (0, 128, 1920, 824))
+        command = mock_run.call_args.args[0]
+        self.assertEqual(command[command.index('-vf') + 1], 'crop=1920:824:0:128')
+        self.assertEqual(command[command.index('-preset') + 1], 'ultrafast')
+
+    def test_maps_first_video_audio_and_subtitle_stream(self, mock_run, mock_detect_encoder):
+        for stream in (None, H264_1080P):
+            black_remove_batch.crop_video('a.mp4', 'a_out.mp4', (0, 128, 1920, 824), stream)
+            command = mock_run.call_args.args[0]
+            self.assertEqual(command[command.index('-i') + 2:command.index('-i') + 8],
+                             ['-map', '0:v:0', '-map', '0:a:0?', '-map', '0:s:0?'])
+
+
+class TestDetectEncoder(unittest.TestCase):
+
+    def setUp(self):
+        black_remove_batch._detect_encoder.cache_clear()
+
+    def tearDown(self):
+        black_remove_batch._detect_encoder.cache_clear()
+
+    @patch.object(black_remove_batch.subprocess, 'run', side_effect=FileNotFoundError)
+    def test_without_ffmpeg_uses_libx264(self, mock_run):
+        self.assertIs(black_remove_batch._detect_encoder(), black_remove_batch.LIBX264_ENCODER)
+
+    @patch.object(black_remove_batch.subprocess, 'run')
+    def test_uses_first_working_hardware_encoder(self, mock_run):
+        # nvenc编译进了FFmpeg但没有可用的显卡，测试编码失败时继续尝试vaapi
+        mock_run.side_effect = [subprocess.CompletedProcess([], 0, stdout=' h264_nvenc \n h264_vaapi '),
+                                subprocess.CompletedProcess([], 1), subprocess.CompletedProcess([], 0)]
+        self.assertEqual(black_remove_batch._detect_encoder().name, 'h264_vaapi')
+        nvenc_probe = mock_run.call_args_list[1].args[0]
+        self.assertEqual(nvenc_probe[nvenc_probe.index('-cq') + 1:nvenc_probe.index('-cq') + 4], ['23', '-b:v', '0'])
+
+    @patch.object(black_remove_batch.subprocess, 'run',
+                  return_value=subprocess.CompletedProcess([], 0, stdout=' libx264 '))
+    def test_without_hardware_encoder_uses_libx264(self, mock_run):
+        self.assertIs(black_remove_batch._detect_encoder(), black_remove_batch.LIBX264_ENCODER)
+        mock_run.assert_called_once()
+
+
+@patch.object(black_remove_batch, '_detect_encoder', return_value=black_remove_batch.LIBX264_ENCODER)
+class TestRunCropBatch(unittest.TestCase):
+    jobs = [('a.mp4', 'a_out.mp4', (0, 60, 640, 360)), ('b.mp4', 'b_out.mp4', (0, 0, 320, 240))]
+
+    @patch.object(black_remove_batch, 'crop_video', return_value='done')
+    def test_single_job_uses_crop_video(self, mock_crop_video, mock_detect_encoder):
+        self.assertEqual(black_remove_batch._run_crop_batch(self.jobs[:1], 'veryfast'), ['done'])
+        mock_crop_video.assert_called_once_with(*self.jobs[0], preset='veryfast')
+
+    @patch.object(black_remove_batch.subprocess, 'run')
+    def test_batch_command(self, mock_run, mock_detect_encoder):
+        messages = black_remove_batch._run_crop_batch(self.jobs, 'veryfast')
+        command = mock_run.call_args.args[0]
+        self.assertEqual(command[:6], ['ffmpeg', '-y', '-i', 'a.mp4', '-i', 'b.mp4'])
+        self.assertEqual(command.count('-preset'), 2)
+        self.assertEqual(command[command.index('-preset') + 1], 'veryfast')
+        self.assertIn('[0:v]crop=640:360:0:60[v0];[1:v]crop=320:240:0:0[v1]', command)
+        for index in range(2):
+            position = command.index(f'[v{index}]')
+            self.assertEqual(command[position + 1:position + 5], ['-map', f'{index}:a:0?', '-map', f'{index}:s:0?'])
+        self.assertEqual(command[-1], 'b_out.mp4')
+        self.assertEqual(messages, ['视频裁剪完成: a.mp4 -> a_out.mp4', '视频裁剪完成: b.mp4 -> b_out.mp4'])
+
+    @patch.object(black_remove_batch.subprocess, 'run', side_effect=FileNotFoundError)
+    def test_without_ffmpeg(self, mock_run, mock_detect_encoder):
+        self.assertEqual(black_remove_batch._run_crop_batch(self.jobs), ["未找到ffmpeg，请确保已安装并添加到环境变量"])
+
+    @patch.object(black_remove_batch, 'crop_video', return_value='retried')
+    @patch.object(black_remove_batch, '_crop_output_complete', side_effect=lambda src, dst: src == 'a.mp4')
+    @patch.object(black_remove_batch.subprocess, 'run', side_effect=subprocess.CalledProcessError(1, 'ffmpeg'))
+    def test_failure_retries_incomplete_outputs(self, mock_run, mock_complete, mock_crop_video,
+                                                mock_detect_encoder):
+        messages = black_remove_batch._run_crop_batch(self.jobs)
+        self.assertEqual(messages, ['视频裁剪完成: a.mp4 -> a_out.mp4', 'retried'])
+        mock_crop_video.assert_called_once_with(*self.jobs[1], preset='ultrafast')
+
+    @patch.object(black_remove_batch.subprocess, 'run')
+    def test_batch_hardware_encoder(self, mock_run, mock_detect_encoder):
+        vaapi = next(encoder for encoder in black_remove_batch.H264_ENCODERS if encoder.name == 'h264_vaapi')
+        mock_detect_encoder.return_value = vaapi
+        black_remove_batch._run_crop_batch(self.jobs)
+        command = mock_run.call_args.args[0]
+        self.assertEqual(command[2:4], list(vaapi.input_args))
+        self.assertIn('[0:v]crop=640:360:0:60,format=nv12,hwupload[v0];'
+                      '[1:v]crop=320:240:0:0,format=nv12,hwupload[v1]', command)
+        self.assertEqual(command.count('h264_vaapi'), 2)
+        self.assertNotIn('-preset', command)
+
+    @patch.object(black_remove_batch, '_probe_duration',
+                  side_effect=lambda path: {'a.mp4': 10.0, 'a_out.mp4': 4.2}[path])
+    def test_output_complete_compares_duration(self, mock_probe_duration, mock_detect_encoder):
+        with TemporaryDirectory() as tmp:
+            self.assertFalse(black_remove_batch._crop_output_complete('a.mp4', str(Path(tmp, 'missing.mp4'))))
+        with patch.object(black_remove_batch.os.path, 'exists', return_value=True):
+            self.assertFalse(black_remove_batch._crop_output_complete('a.mp4', 'a_out.mp4'))
+
+
+class TestProcessOne(unittest.TestCase):
+
+    @patch.object(black_remove_batch.subprocess, 'run')
+    @patch.object(black_remove_batch, '_iter_frames_piped', return_value=iter(()))
+    @patch.object(black_remove_batch, '_probe_stream', return_value=H264_1080P)
+    def test_video_probed_once(self, mock_probe_stream, mock_iter_frames, mock_run):
+        with TemporaryDirectory() as tmp:
+            with patch.object(VideoRemover, 'detect_frames', return_value=(0, 128, 1920, 824)):
+                message, crop_job = black_remove_batch._process_one(Path(tmp, 'in.mp4'),
+                                                                    Path(tmp, 'out', 'in_noblack.mp4'),
+                                                                    'video', True, 'dynamic', 500, 30, False)
+        self.assertTrue(message.startswith("视频裁剪完成"))
+        self.assertIsNone(crop_job)
+        mock_probe_stream.assert_called_once()
+        self.assertIn('h264_metadata=crop_left=0:crop_right=0:crop_top=128:crop_bottom=136',
+                      mock_run.call_args.args[0])
+
+    def test_image_without_black_is_copied(self):
+        with TemporaryDirectory() as tmp:
+            input_path = Path(tmp, 'a.png')
+            Image.new('RGB', (40, 30)).save(input_path)
+            with patch.object(BlackRemover, 'start', return_value=(0, 0, 40, 30)):
+                message, crop_job = black_remove_batch._process_one(input_path, Path(tmp, 'out', 'a_noblack.png'),
+                                                                    'image', True, 'dynamic', 500, 30, False)
+            self.assertTrue(message.startswith("无需裁剪"))
+            self.assertIsNone(crop_job)
+            self.assertEqual(Path(tmp, 'out', 'a_noblack.png').read_bytes(), input_path.read_bytes())
+
+    def test_image_without_black_is_hardlinked(self):
+        with TemporaryDirectory() as tmp:
+            input_path = Path(tmp, 'a.png')
+            Image.new('RGB', (40, 30)).save(input_path)
+            with patch.object(BlackRemover, 'start', return_value=(0, 0, 40, 30)):
+                black_remove_batch._process_one(input_path, Path(tmp, 'out', 'a_noblack.png'),
+                                                'image', True, 'dynamic', 500, 30, True)
+            self.assertTrue(Path(tmp, 'out', 'a_noblack.png').samefile(input_path))
+
+    @patch.object(black_remove_batch, '_iter_frames_piped', return_value=iter(()))
+    @patch.object(black_remove_batch, '_probe_stream', return_value={**H264_1080P, 'codec_name': 'hevc'})
+    def test_reencode_returns_crop_job(self, mock_probe_stream, mock_iter_frames):
+        with TemporaryDirectory() as tmp:
+            with patch.object(VideoRemover, 'detect_frames', return_value=(0, 128, 1920, 824)):
+                _, crop_job = black_remove_batch._process_one(Path(tmp, 'in.mp4'), Path(tmp, 'out', 'in_noblack.mp4'),
+                                                              'video', True, 'dynamic', 500, 30, False)
+            self.assertEqual(crop_job, (str(Path(tmp, 'in.mp4')), str(Path(tmp, 'out', 'in_noblack.mp4')),
+                                        (0, 128, 1920, 824)))
+            self.assertTrue(Path(tmp, 'out').is_dir())
+
+    @patch.object(black_remove_batch, '_iter_frames_piped', return_value=iter(()))
+    @patch.object(black_remove_batch, '_probe_stream', return_value=H264_1080P)
+    def test_corrupted_video_reports_failure(self, mock_probe_stream, mock_iter_frames):
+        with TemporaryDirectory() as tmp:
+            with patch.object(VideoRemover, 'detect_frames', return_value=(0, 0, 0, 0)):
+                message, crop_job = black_remove_batch._process_one(Path(tmp, 'in.mp4'),
+                                                                    Path(tmp, 'out', 'in_noblack.mp4'),
+                                                                    'video', True, 'dynamic', 500, 30, False)
+        self.assertIsNone(crop_job)
+        self.assertIn("无效的裁剪参数", message)
+
+
+class TestBatchCropVideos(unittest.TestCase):
+
+    def test_excluded_media_types_skipped_silently(self):
+        with TemporaryDirectory() as tmp:
+            Path(tmp, 'in').mkdir()
+            Path(tmp, 'in', 'a.png').touch()
+            Path(tmp, 'in', 'b.txt').touch()
+            with patch.object(black_remove_batch, 'print', create=True) as mock_print:
+                black_remove_batch.batch_crop_videos(str(Path(tmp, 'in')), str(Path(tmp, 'out')))
+        mock_print.assert_called_once_with(f"跳过不支持的文件: {Path(tmp, 'in', 'b.txt')}")
+
+
+if __name__ == '__main__':
+    unittest.main()
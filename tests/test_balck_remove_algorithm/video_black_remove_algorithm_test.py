@@ -2,7 +2,10 @@ import unittest
 from pathlib import Path
 from unittest.mock import patch
 
+import numpy as np
+
 from src.common.black_remove_algorithm.img_black_remover import IMGBlackRemover
+from src.common.black_remove_algorithm.video_remover import VideoRemover
 
 
 class TestIMGBlackRemover(unittest.TestCase):
@@ -36,5 +39,36 @@ class TestIMGBlackRemover(unittest.TestCase):
                     "E:\\load\\python\\Project\\VideoFusion\\tests\\test_data\\videos\\non_existent.mp4")
 
 
+class TestVideoRemover(unittest.TestCase):
+
+    def setUp(self):
+        self.video_remover = VideoRemover()
+
+    @staticmethod
+    def _moving_frames(count: int = 10) -> list[np.ndarray]:
+        # 480x640的灰度帧,只有中间(100, 50, 440, 380)区域有画面变化
+        frames = []
+        for i in range(count):
+            frame = np.zeros((480, 640), dtype=np.uint8)
+            frame[50:430, 100:540] = 80 if i % 2 else 200
+            frames.append(frame)
+        return frames
+
+    def assertRectClose(self, rect: tuple[int, int, int, int], expected: tuple[int, int, int, int]):
+        # 高斯模糊会让变化区域向外扩展几个像素
+        for actual_value, expected_value in zip(rect, expected):
+            self.assertAlmostEqual(actual_value, expected_value, delta=4)
+
+    def test_detect_frames_returns_changed_region(self):
+        self.assertRectClose(self.video_remover.detect_frames(self._moving_frames()), (100, 50, 440, 380))
+
+    def test_detect_frames_accepts_bgr_frames(self):
+        frames = [np.dstack([frame] * 3) for frame in self._moving_frames()]
+        self.assertRectClose(self.video_remover.detect_frames(frames), (100, 50, 440, 380))
+
+    def test_detect_frames_without_frames_returns_zero_rect(self):
+        self.assertEqual(self.video_remover.detect_frames([]), (0, 0, 0, 0))
+
+
 if __name__ == '__main__':
     unittest.main()
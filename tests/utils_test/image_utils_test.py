@@ -43,6 +43,23 @@ class TestImageUtils(unittest.TestCase):
         img4 = self.image_utils.read_image(no_black_img2)
         self.assertFalse(self.image_utils.has_black_border(img4))
 
+    def test_has_black_border_accepts_gray_image(self):
+        gray_with_black_border = self.image_with_black_border[:, :, 0]
+        self.assertTrue(self.image_utils.has_black_border(gray_with_black_border))
+        self.assertFalse(self.image_utils.has_black_border(self.white_image[:, :, 0]))
+
+    def test_remove_small_regions(self):
+        binary = np.zeros((100, 100), dtype=np.uint8)
+        binary[10:60, 10:60] = 255  # 面积2500,保留
+        binary[80:90, 80:90] = 255  # 面积100,去除
+
+        result = self.image_utils.remove_small_regions(binary, 1500)
+
+        expected = np.zeros_like(binary)
+        expected[10:60, 10:60] = 255
+        self.assertTrue(np.array_equal(result, expected))
+        self.assertEqual(result.dtype, np.uint8)
+
 
 if __name__ == '__main__':
     unittest.main()